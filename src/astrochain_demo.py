@@ -3,10 +3,10 @@ import json
 import time
 from datetime import datetime
 
-# Импортируем наши модули (в Colab напрямую)
-exec(open('src/astronomical/data_fetcher.py').read())
-exec(open('src/core/blockchain.py').read())
-exec(open('src/consensus/proof_of_astronomy.py').read())
+# Импортируем наши модули
+from astronomical.data_fetcher import AstronomicalDataFetcher
+from core.blockchain import AstroBlockchain, Transaction, Block
+from consensus.proof_of_astronomy import ProofOfAstronomy
 
 class AstroChainDemo:
     """
@@ -3,8 +3,35 @@ import requests
 import hashlib
 import json
 import time
-from datetime import datetime
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from core.timeutil import iso_from_ns
+
+try:
+    import orjson
+except ImportError:  # orjson — необязательная зависимость
+    orjson = None
+
+def _loads(content: bytes) -> Any:
+    """Разбирает JSON через orjson, если он установлен"""
+    if orjson:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def _last_json_object(tail: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Достает последний объект из хвоста JSON-массива плоских объектов
+    (ответ на Range-запрос начинается с середины документа)
+    """
+    end = tail.rfind(b"}")
+    start = tail.rfind(b"{", 0, end)
+    if start < 0 or end < 0:
+        return None
+    try:
+        return _loads(tail[start:end + 1])
+    except ValueError:
+        return None
 
 class AstronomicalDataFetcher:
     """
@@ -19,63 +46,110 @@ class AstronomicalDataFetcher:
         self.timeout = 10
         self.last_fetch_time = None
         self.cached_data = {}
+        # Сессия переиспользует TCP/TLS-соединения между запросами
+        self.session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.sources))
+        # Время жизни кеша по источникам, в секундах
+        self.ttl = {"iss": 5, "solar": 60}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        # Сколько байт с конца файла NOAA запрашивать ради последней записи
+        self.solar_tail_bytes = 8192
+    
+    def _get_cached(self, source: str) -> Optional[Dict[str, Any]]:
+        """Возвращает данные источника из кеша, если они еще не устарели"""
+        entry = self._cache.get(source)
+        if entry and time.monotonic() - entry[0] < self.ttl[source]:
+            return entry[1]
+        return None
+    
+    def _set_cached(self, source: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Сохраняет данные источника в кеш"""
+        self._cache[source] = (time.monotonic(), data)
+        return data
     
     def fetch_iss_position(self) -> Optional[Dict[str, Any]]:
         """Получает текущую позицию МКС"""
+        cached = self._get_cached("iss")
+        if cached:
+            return cached
+        
         try:
-            response = requests.get(self.sources["iss"], timeout=self.timeout)
+            response = self.session.get(self.sources["iss"], timeout=self.timeout)
             if response.status_code == 200:
-                data = response.json()
-                return {
+                data = _loads(response.content)
+                return self._set_cached("iss", {
                     "latitude": float(data["iss_position"]["latitude"]),
                     "longitude": float(data["iss_position"]["longitude"]),
                     "timestamp": data["timestamp"]
-                }
+                })
         except Exception as e:
             print(f"Error fetching ISS position: {e}")
         return None
     
     def fetch_solar_activity(self) -> Optional[Dict[str, Any]]:
         """Получает данные солнечной активности"""
+        cached = self._get_cached("solar")
+        if cached:
+            return cached
+        
         try:
-            response = requests.get(self.sources["solar"], timeout=self.timeout)
-            if response.status_code == 200:
-                data = response.json()
-                # Берем последнее измерение
-                if data and len(data) > 0:
-                    latest = data[-1]
-                    return {
-                        "flux": latest.get("flux", 0),
-                        "energy": latest.get("energy", "unknown"),
-                        "time_tag": latest.get("time_tag", ""),
-                        "satellite": latest.get("satellite", 0)
-                    }
+            # Нужна только последняя запись — просим у сервера хвост файла
+            response = self.session.get(
+                self.sources["solar"], timeout=self.timeout,
+                headers={"Range": f"bytes=-{self.solar_tail_bytes}"}
+            )
+            latest = None
+            if response.status_code == 206:
+                latest = _last_json_object(response.content)
+            
+            if latest is None:
+                # Сервер не поддержал Range или хвост не разобрался — берем весь файл
+                if response.status_code != 200:
+                    response = self.session.get(self.sources["solar"], timeout=self.timeout)
+                if response.status_code == 200:
+                    data = _loads(response.content)
+                    # Берем последнее измерение
+                    if data and len(data) > 0:
+                        latest = data[-1]
+            
+            if latest is not None:
+                return self._set_cached("solar", {
+                    "flux": latest.get("flux", 0),
+                    "energy": latest.get("energy", "unknown"),
+                    "time_tag": latest.get("time_tag", ""),
+                    "satellite": latest.get("satellite", 0)
+                })
         except Exception as e:
             print(f"Error fetching solar activity: {e}")
         return None
     
     def get_astronomical_snapshot(self) -> Dict[str, Any]:
         """Получает снимок всех астрономических данных"""
-        current_time = datetime.utcnow()
+        current_time_ns = time.time_ns()
         
         snapshot = {
-            "timestamp": current_time.isoformat(),
+            "timestamp": iso_from_ns(current_time_ns),
+            "timestamp_ns": current_time_ns,
             "sources": {}
         }
         
+        # Запрашиваем источники параллельно: задержка — максимум, а не сумма RTT
+        iss_future = self._executor.submit(self.fetch_iss_position)
+        solar_future = self._executor.submit(self.fetch_solar_activity)
+        
         # Получаем данные МКС
-        iss_data = self.fetch_iss_position()
+        iss_data = iss_future.result()
         if iss_data:
             snapshot["sources"]["iss"] = iss_data
         
         # Получаем солнечную активность
-        solar_data = self.fetch_solar_activity()
+        solar_data = solar_future.result()
         if solar_data:
             snapshot["sources"]["solar"] = solar_data
         
         # Сохраняем кеш
         self.cached_data = snapshot
-        self.last_fetch_time = current_time
+        self.last_fetch_time = current_time_ns
         
         return snapshot
     
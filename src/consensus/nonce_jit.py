@@ -0,0 +1,170 @@
+"""
+Поиск nonce, скомпилированный Numba (необязательная зависимость)
+
+Из njit-кода нельзя вызвать hashlib, поэтому SHA-256 реализован здесь же.
+Постоянный префикс сообщения сжимается один раз, а на каждой попытке
+обрабатывается только хвост с nonce; диапазон делится между потоками.
+Используется только по явному запросу: ProofOfAstronomy(use_jit=True)
+"""
+from typing import Optional
+
+import numba
+import numpy as np
+
+_MASK = 0xFFFFFFFF
+
+_K = np.array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+], dtype=np.int64)
+
+_H0 = np.array([
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+], dtype=np.int64)
+
+# Сколько nonce проверяется за один параллельный проход:
+# после каждого прохода поиск останавливается, если nonce найден
+WAVE_SIZE = 1 << 16
+
+
+@numba.njit(cache=True, inline="always")
+def _rotr(x, n):
+    return ((x >> n) | (x << (32 - n))) & _MASK
+
+
+@numba.njit(cache=True)
+def _compress(state, data, offset, w):
+    """Сжимает 64-байтовый блок data[offset:offset + 64] в state (на месте)"""
+    for i in range(16):
+        j = offset + 4 * i
+        w[i] = (np.int64(data[j]) << 24) | (np.int64(data[j + 1]) << 16) | (np.int64(data[j + 2]) << 8) | np.int64(data[j + 3])
+    for i in range(16, 64):
+        s0 = _rotr(w[i - 15], 7) ^ _rotr(w[i - 15], 18) ^ (w[i - 15] >> 3)
+        s1 = _rotr(w[i - 2], 17) ^ _rotr(w[i - 2], 19) ^ (w[i - 2] >> 10)
+        w[i] = (w[i - 16] + s0 + w[i - 7] + s1) & _MASK
+
+    a, b, c, d = state[0], state[1], state[2], state[3]
+    e, f, g, h = state[4], state[5], state[6], state[7]
+    for i in range(64):
+        t1 = (h + (_rotr(e, 6) ^ _rotr(e, 11) ^ _rotr(e, 25)) + ((e & f) ^ (~e & g)) + _K[i] + w[i]) & _MASK
+        t2 = ((_rotr(a, 2) ^ _rotr(a, 13) ^ _rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))) & _MASK
+        h, g, f, e = g, f, e, (d + t1) & _MASK
+        d, c, b, a = c, b, a, (t1 + t2) & _MASK
+
+    state[0] = (state[0] + a) & _MASK
+    state[1] = (state[1] + b) & _MASK
+    state[2] = (state[2] + c) & _MASK
+    state[3] = (state[3] + d) & _MASK
+    state[4] = (state[4] + e) & _MASK
+    state[5] = (state[5] + f) & _MASK
+    state[6] = (state[6] + g) & _MASK
+    state[7] = (state[7] + h) & _MASK
+
+
+@numba.njit(cache=True)
+def _matches_target(state, target, nibble):
+    """Проверяет начало хеша (state в big-endian) на совпадение с целью"""
+    size = target.shape[0]
+    for k in range(size):
+        if (state[k >> 2] >> (24 - 8 * (k & 3))) & 0xFF != target[k]:
+            return False
+    if nibble >= 0:
+        return (state[size >> 2] >> (28 - 8 * (size & 3))) & 0xF == nibble
+    return True
+
+
+@numba.njit(cache=True)
+def _search_range(midstate, tail, prefix_len, target, nibble, start, stop):
+    """Последовательно ищет первый подходящий nonce в [start, stop)"""
+    w = np.empty(64, dtype=np.int64)
+    state = np.empty(8, dtype=np.int64)
+    block = np.zeros(128, dtype=np.uint8)
+    digits = np.empty(20, dtype=np.uint8)
+    tail_len = tail.shape[0]
+    block[:tail_len] = tail
+
+    for nonce in range(start, stop):
+        # Десятичная запись nonce — как b"%d" % nonce в hashlib-версии
+        n = nonce
+        count = 0
+        while True:
+            digits[count] = 48 + n % 10
+            n //= 10
+            count += 1
+            if n == 0:
+                break
+        pos = tail_len
+        for j in range(count - 1, -1, -1):
+            block[pos] = digits[j]
+            pos += 1
+
+        # Паддинг SHA-256: 0x80, нули и длина сообщения в битах
+        bit_length = (prefix_len + count) * 8
+        block[pos] = 0x80
+        end = 64 if pos + 9 <= 64 else 128
+        block[pos + 1:end - 8] = 0
+        for j in range(8):
+            block[end - 1 - j] = (bit_length >> (8 * j)) & 0xFF
+
+        state[:] = midstate
+        _compress(state, block, 0, w)
+        if end == 128:
+            _compress(state, block, 64, w)
+        if _matches_target(state, target, nibble):
+            return nonce
+
+    return -1
+
+
+@numba.njit(cache=True, parallel=True)
+def _search_wave(midstate, tail, prefix_len, target, nibble, start, count, chunks):
+    """Делит [start, start + count) между потоками и возвращает наименьший найденный nonce"""
+    chunk = (count + chunks - 1) // chunks
+    found = np.full(chunks, -1, dtype=np.int64)
+    for c in numba.prange(chunks):
+        lo = start + c * chunk
+        hi = min(lo + chunk, start + count)
+        if lo < hi:
+            found[c] = _search_range(midstate, tail, prefix_len, target, nibble, lo, hi)
+
+    for c in range(chunks):
+        if found[c] >= 0:
+            return found[c]
+    return -1
+
+
+def search_nonce(prefix: bytes, target_bytes: bytes, target_nibble: Optional[int],
+                 start: int, count: int, threads: Optional[int] = None) -> Optional[int]:
+    """
+    То же, что _find_nonce из proof_of_astronomy, но без интерпретатора
+    в горячем цикле и на threads потоках (по умолчанию — на всех)
+    """
+    data = np.frombuffer(prefix, dtype=np.uint8)
+    full = len(prefix) // 64 * 64
+
+    # Полные блоки префикса одинаковы для всех попыток — сжимаем их один раз
+    midstate = _H0.copy()
+    w = np.empty(64, dtype=np.int64)
+    for offset in range(0, full, 64):
+        _compress(midstate, data, offset, w)
+    tail = data[full:].copy()
+
+    target = np.frombuffer(target_bytes, dtype=np.uint8)
+    nibble = -1 if target_nibble is None else target_nibble
+    chunks = min(threads or numba.config.NUMBA_NUM_THREADS, numba.config.NUMBA_NUM_THREADS)
+    numba.set_num_threads(chunks)
+
+    stop = start + count
+    for wave_start in range(start, stop, WAVE_SIZE):
+        found = _search_wave(midstate, tail, len(prefix), target, nibble,
+                             wave_start, min(WAVE_SIZE, stop - wave_start), chunks)
+        if found >= 0:
+            return int(found)
+
+    return None
@@ -1,72 +1,150 @@
 
+import os
 import time
-import hashlib
-from datetime import datetime, timedelta
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional, List
 
+from core import hash_backend
+
+try:
+    # Скомпилированный поиск nonce — только если установлена numba
+    from consensus.nonce_jit import search_nonce as _search_nonce_jit
+except ImportError:
+    _search_nonce_jit = None
+
+# Окно округления времени в консенсусе — 10 минут
+CONSENSUS_WINDOW_NS = 10 * 60 * 1_000_000_000
+
+# Двоичная раскладка полей консенсус-хеша: метка источника + значения
+_ISS_FIELDS = struct.Struct("<cdd")
+_SOLAR_FIELDS = struct.Struct("<cd")
+_TIME_FIELDS = struct.Struct("<cq")
+
+# Размер диапазона nonce, который получает один процесс-воркер
+NONCE_CHUNK = 1 << 14
+
+
+def _find_nonce(prefix: bytes, target_bytes: bytes, target_nibble: Optional[int],
+                start: int, count: int) -> Optional[int]:
+    """
+    Ищет первый nonce в диапазоне [start, start + count), сырой хеш
+    которого начинается с target_bytes (и с полубайта target_nibble,
+    если сложность задана нечетным числом hex-символов)
+    """
+    # Префикс одинаков для всех попыток: сжимаем его один раз и дальше
+    # клонируем готовое состояние SHA-256, дописывая только nonce
+    base = hash_backend.new(prefix)
+    size = len(target_bytes)
+    for nonce in range(start, start + count):
+        candidate = base.copy()
+        candidate.update(b"%d" % nonce)
+        digest = candidate.digest()
+        if digest[:size] == target_bytes and (target_nibble is None or digest[size] >> 4 == target_nibble):
+            return nonce
+    
+    return None
+
 class ProofOfAstronomy:
     """
     Консенсус-алгоритм на основе астрономических данных
     """
     
-    def __init__(self, block_interval_minutes: int = 10):
+    def __init__(self, block_interval_minutes: int = 10, workers: Optional[int] = None, use_jit: bool = False):
         self.block_interval = timedelta(minutes=block_interval_minutes)
+        self.block_interval_ns = block_interval_minutes * 60 * 1_000_000_000
         self.last_block_time = None
         self.difficulty_target = "0000"  # Начальная сложность
-        self.node_id = hashlib.sha256(str(time.time()).encode()).hexdigest()[:16]
+        self.node_id = hash_backend.new(str(time.time()).encode()).hexdigest()[:16]
+        self._buf = bytearray(128)  # Буфер для полей консенсус-хеша
+        # Число процессов для поиска nonce (по умолчанию — все ядра);
+        # пул создается при первом параллельном поиске и переиспользуется
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Скомпилированный поиск nonce (numba) включается только явно
+        if use_jit and _search_nonce_jit is None:
+            raise ImportError("numba is not installed (pip install numba)")
+        self.use_jit = use_jit
+    
+    @property
+    def difficulty_target(self) -> str:
+        """Требуемый hex-префикс хеша"""
+        return self._difficulty_target
+    
+    @difficulty_target.setter
+    def difficulty_target(self, target: str):
+        # Заранее переводим hex-префикс в байты, чтобы сравнивать
+        # его с digest() без hex-кодирования каждого хеша
+        self._difficulty_target = target
+        self._target_bytes = bytes.fromhex(target[:len(target) // 2 * 2])
+        self._target_nibble = int(target[-1], 16) if len(target) % 2 else None
+    
+    def _matches_target(self, digest: bytes) -> bool:
+        """Проверяет, что сырой хеш начинается с difficulty_target"""
+        size = len(self._target_bytes)
+        if digest[:size] != self._target_bytes:
+            return False
+        return self._target_nibble is None or digest[size] >> 4 == self._target_nibble
     
-    def is_time_for_new_block(self, last_block_timestamp: str) -> bool:
-        """Проверяет, пора ли создавать новый блок"""
-        if not last_block_timestamp:
+    def is_time_for_new_block(self, last_block_timestamp_ns: Optional[int]) -> bool:
+        """Проверяет, пора ли создавать новый блок (время в наносекундах)"""
+        if not last_block_timestamp_ns:
             return True
         
-        try:
-            last_time = datetime.fromisoformat(last_block_timestamp.replace('Z', '+00:00').replace('+00:00', ''))
-            current_time = datetime.utcnow()
-            return (current_time - last_time) >= self.block_interval
-        except:
-            return True
+        return (time.time_ns() - last_block_timestamp_ns) >= self.block_interval_ns
     
     def calculate_astronomical_consensus(self, astronomical_data: Dict[str, Any]) -> str:
         """
         Вычисляет консенсус-хеш на основе астрономических данных
         Этот хеш определяет, кто может создать блок
         """
-        consensus_components = []
+        # Поля пишем в двоичном виде в заранее выделенный буфер:
+        # метка источника + значения фиксированной длины
+        buf = self._buf
+        cursor = 0
+        raw_timestamp = None
+        sources = astronomical_data.get("sources", {})
         
         # Добавляем данные МКС
-        if "iss" in astronomical_data.get("sources", {}):
-            iss = astronomical_data["sources"]["iss"]
+        if "iss" in sources:
+            iss = sources["iss"]
             # Округляем координаты для стабильности
             lat_rounded = round(float(iss["latitude"]), 2)
             lon_rounded = round(float(iss["longitude"]), 2)
-            consensus_components.append(f"iss_{lat_rounded}_{lon_rounded}")
+            _ISS_FIELDS.pack_into(buf, cursor, b"I", lat_rounded, lon_rounded)
+            cursor += _ISS_FIELDS.size
         
         # Добавляем солнечную активность
-        if "solar" in astronomical_data.get("sources", {}):
-            solar = astronomical_data["sources"]["solar"]
-            flux_rounded = round(float(solar["flux"]), 4)
-            consensus_components.append(f"solar_{flux_rounded}")
+        if "solar" in sources:
+            flux_rounded = round(float(sources["solar"]["flux"]), 4)
+            _SOLAR_FIELDS.pack_into(buf, cursor, b"S", flux_rounded)
+            cursor += _SOLAR_FIELDS.size
         
-        # Добавляем временную метку (округленную до минут)
+        # Добавляем временную метку (округленную до 10-минутных интервалов)
+        timestamp_ns = astronomical_data.get("timestamp_ns")
         timestamp = astronomical_data.get("timestamp", "")
-        if timestamp:
+        if timestamp_ns is None and timestamp:
             try:
                 dt = datetime.fromisoformat(timestamp.replace('Z', ''))
-                # Округляем до 10-минутных интервалов
-                minutes_rounded = (dt.minute // 10) * 10
-                time_rounded = dt.replace(minute=minutes_rounded, second=0, microsecond=0)
-                consensus_components.append(f"time_{time_rounded.isoformat()}")
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=timezone.utc)
+                timestamp_ns = int(dt.timestamp()) * 1_000_000_000
             except:
-                consensus_components.append(f"time_{timestamp}")
-        
-        # Создаем консенсус-строку
-        consensus_string = "_".join(consensus_components)
+                raw_timestamp = f"t{timestamp}".encode()
+        if timestamp_ns is not None:
+            time_rounded = (timestamp_ns // CONSENSUS_WINDOW_NS) * CONSENSUS_WINDOW_NS
+            _TIME_FIELDS.pack_into(buf, cursor, b"T", time_rounded)
+            cursor += _TIME_FIELDS.size
         
         # Хешируем
-        consensus_hash = hashlib.sha256(consensus_string.encode()).hexdigest()
+        hasher = hash_backend.new(memoryview(buf)[:cursor])
+        if raw_timestamp is not None:
+            # Неразобранная метка времени имеет произвольную длину
+            hasher.update(raw_timestamp)
         
-        return consensus_hash
+        return hasher.hexdigest()
     
     def can_create_block(self, consensus_hash: str, node_id: str) -> bool:
         """
@@ -74,24 +152,77 @@ class ProofOfAstronomy:
         на основе астрономического консенсуса
         """
         # Комбинируем консенсус-хеш с ID узла
-        node_hash = hashlib.sha256(f"{consensus_hash}_{node_id}".encode()).hexdigest()
+        node_hash = hash_backend.sha256_single(f"{consensus_hash}_{node_id}".encode())
         
         # Проверяем, начинается ли хеш с определенного количества нулей
-        return node_hash.startswith(self.difficulty_target)
+        return self._matches_target(node_hash)
     
-    def find_valid_nonce(self, consensus_hash: str, max_attempts: int = 100000) -> Optional[int]:
+    def find_valid_nonce(self, consensus_hash: str, max_attempts: int = 100000, start: int = 0) -> Optional[int]:
         """
         Ищет nonce, который позволит создать блок
         (упрощенная версия майнинга)
+        
+        Поиск идет по диапазону [start, start + max_attempts), поэтому его
+        можно продолжить или разбить на непересекающиеся части
         """
-        for nonce in range(max_attempts):
-            candidate_hash = hashlib.sha256(f"{consensus_hash}_{self.node_id}_{nonce}".encode()).hexdigest()
-            
-            if candidate_hash.startswith(self.difficulty_target):
+        # Постоянный префикс сообщения собираем один раз, а не на каждой попытке
+        prefix = f"{consensus_hash}_{self.node_id}_".encode()
+        # У скомпилированного поиска своя реализация SHA-256, поэтому при
+        # эталонном бэкенде (A/B-проверка) он не используется
+        if self.use_jit and hash_backend.get_backend() == "openssl":
+            try:
+                return _search_nonce_jit(prefix, self._target_bytes, self._target_nibble,
+                                         start, max_attempts, self.workers)
+            except Exception as e:
+                # Например, ошибка компиляции — дальше ищем через hashlib
+                print(f"Error in compiled nonce search, falling back to hashlib: {e}")
+                self.use_jit = False
+        if self.workers > 1 and max_attempts > NONCE_CHUNK:
+            return self._find_nonce_parallel(prefix, start, max_attempts)
+        return _find_nonce(prefix, self._target_bytes, self._target_nibble, start, max_attempts)
+    
+    def _find_nonce_parallel(self, prefix: bytes, start: int, count: int) -> Optional[int]:
+        """
+        Делит диапазон nonce на непересекающиеся части по NONCE_CHUNK
+        и проверяет их в пуле процессов. Результаты забираются по порядку,
+        поэтому найденный nonce совпадает с последовательным поиском
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        
+        stop = start + count
+        chunks = iter(range(start, stop, NONCE_CHUNK))
+        pending = deque()
+        
+        def submit_next() -> None:
+            chunk_start = next(chunks, None)
+            if chunk_start is not None:
+                pending.append(self._executor.submit(
+                    _find_nonce, prefix, self._target_bytes, self._target_nibble,
+                    chunk_start, min(NONCE_CHUNK, stop - chunk_start)
+                ))
+        
+        # Держим в работе не больше двух частей на процесс
+        for _ in range(self.workers * 2):
+            submit_next()
+        
+        while pending:
+            nonce = pending.popleft().result()
+            if nonce is not None:
+                # Остальные части больше не нужны
+                for future in pending:
+                    future.cancel()
                 return nonce
+            submit_next()
         
         return None
     
+    def close(self):
+        """Останавливает пул процессов поиска nonce"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+    
     def validate_astronomical_block(self, block_data: Dict[str, Any]) -> bool:
         """
         Проверяет валидность блока с астрономическими данными
@@ -1,74 +1,369 @@
 
-import hashlib
 import json
 import time
+from array import array
+from collections import defaultdict
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+from core import hash_backend
+from core.storage import BlockStore
+from core.timeutil import iso_from_ns
+
+try:
+    import blake3
+except ImportError:  # blake3 — необязательная зависимость
+    blake3 = None
+
+try:
+    import orjson
+except ImportError:  # orjson — необязательная зависимость
+    orjson = None
+
+# Хеш-функции транзакций, блоков и дерева Меркла. Выбирается для
+# каждой цепочки отдельно; SHA-256 остается по умолчанию ради совместимости
+HASH_ALGORITHMS = ("sha256", "blake3")
+DEFAULT_HASH_ALGORITHM = "sha256"
+
+def check_hash_algorithm(name: str):
+    """Проверяет, что хеш-функция известна и доступна"""
+    if name not in HASH_ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm: {name}")
+    if name == "blake3" and blake3 is None:
+        raise ImportError("blake3 is not installed (pip install blake3)")
+
+def _digest(data: bytes, algorithm: str = DEFAULT_HASH_ALGORITHM) -> bytes:
+    """Хеширует данные заданной хеш-функцией (сырые 32 байта)"""
+    if algorithm == "blake3":
+        return blake3.blake3(data).digest()
+    return hash_backend.sha256_single(data)
+
+# Типы, repr которых детерминирован и однозначен
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+def _canon_bytes(data: Dict) -> bytes:
+    """
+    Каноническое представление data для хеширования транзакции:
+    пары ключ-значение в порядке ключей без полной JSON-сериализации.
+    Ключи пишутся в JSON-виде, а repr и JSON экранируют управляющие
+    символы, поэтому разделители \x1f/\x1e внутри пар не встречаются
+    """
+    if not data:
+        return b""
+    
+    for key in data:
+        # Как и при сохранении в JSON, ключи только строковые:
+        # иначе True и "true" после чтения с диска дали бы разные хеши
+        if not isinstance(key, str):
+            raise TypeError(f"Transaction data keys must be str, not {type(key).__name__}")
+    
+    parts = []
+    for key in sorted(data):
+        value = data[key]
+        if type(value) in _SCALAR_TYPES:
+            parts.append(f"{json.dumps(key)}\x1f{value!r}")
+        else:
+            # Вложенные структуры — через JSON, он же отвергает
+            # несериализуемые значения (множества, произвольные объекты)
+            parts.append(f"{json.dumps(key)}\x1f{json.dumps(value, sort_keys=True)}")
+    return "\x1e".join(parts).encode()
+
+def _hash_level(level: List[bytes], algorithm: str = DEFAULT_HASH_ALGORITHM) -> List[bytes]:
+    """
+    Хеширует все пары одного уровня дерева Меркла за один вызов
+    (длина уровня должна быть четной)
+    """
+    return [_digest(level[i] + level[i + 1], algorithm) for i in range(0, len(level), 2)]
+
+class MerkleAccumulator:
+    """
+    Инкрементальное дерево Меркла: хранит правую границу дерева
+    (не больше одного хеша на уровень), поэтому добавление листа
+    и вычисление корня занимают O(log N)
+    """
+    
+    def __init__(self, hash_algorithm: str = DEFAULT_HASH_ALGORITHM):
+        self.hash_algorithm = hash_algorithm
+        self.frontier: List[Optional[bytes]] = []
+        self.size = 0
+    
+    def add(self, leaf: bytes):
+        """Добавляет лист, поднимая готовые пары на уровень выше"""
+        node = leaf
+        level = 0
+        while level < len(self.frontier) and self.frontier[level] is not None:
+            node = _digest(self.frontier[level] + node, self.hash_algorithm)
+            self.frontier[level] = None
+            level += 1
+        
+        if level == len(self.frontier):
+            self.frontier.append(node)
+        else:
+            self.frontier[level] = node
+        self.size += 1
+    
+    def root(self) -> bytes:
+        """Сворачивает границу в корень (совпадает с Block.calculate_merkle_root)"""
+        if self.size == 0:
+            return _digest(b"", self.hash_algorithm)
+        
+        # Начинаем с самого нижнего незавершенного поддерева
+        lowest = (self.size & -self.size).bit_length() - 1
+        height = (self.size - 1).bit_length()
+        node = self.frontier[lowest]
+        
+        for level in range(lowest, height):
+            left = self.frontier[level] if level != lowest else None
+            if left is None:
+                node = _digest(node + node, self.hash_algorithm)  # Дублируем последний хеш
+            else:
+                node = _digest(left + node, self.hash_algorithm)
+        
+        return node
+
 class Transaction:
     """Базовая транзакция"""
     
-    def __init__(self, from_address: str, to_address: str, amount: float, data: Dict = None):
+    __slots__ = ("from_address", "to_address", "amount", "timestamp_ns", "data", "hash_algorithm",
+                 "tx_hash", "_dict_cache")
+    
+    def __init__(self, from_address: str, to_address: str, amount: float, data: Dict = None,
+                 timestamp_ns: Optional[int] = None, hash_algorithm: str = DEFAULT_HASH_ALGORITHM):
         self.from_address = from_address
         self.to_address = to_address
         self.amount = amount
-        self.timestamp = datetime.utcnow().isoformat()
+        self.timestamp_ns = timestamp_ns if timestamp_ns is not None else time.time_ns()
         self.data = data or {}
+        self.hash_algorithm = hash_algorithm
         self.tx_hash = self.calculate_hash()
+        self._dict_cache: Optional[Dict[str, Any]] = None
     
-    def calculate_hash(self) -> str:
-        """Вычисляет хеш транзакции"""
-        tx_string = f"{self.from_address}{self.to_address}{self.amount}{self.timestamp}{json.dumps(self.data, sort_keys=True)}"
-        return hashlib.sha256(tx_string.encode()).hexdigest()
+    @classmethod
+    def _restore(cls, from_address: str, to_address: str, amount: float, data: Dict,
+                 timestamp_ns: int, hash_algorithm: str, tx_hash: bytes) -> "Transaction":
+        """Собирает транзакцию из сохраненных полей без пересчета хеша"""
+        transaction = cls.__new__(cls)
+        transaction.from_address = from_address
+        transaction.to_address = to_address
+        transaction.amount = amount
+        transaction.timestamp_ns = timestamp_ns
+        transaction.data = data
+        transaction.hash_algorithm = hash_algorithm
+        transaction.tx_hash = tx_hash
+        transaction._dict_cache = None
+        return transaction
+    
+    def calculate_hash(self) -> bytes:
+        """Вычисляет хеш транзакции (сырые 32 байта)"""
+        tx_string = f"{self.from_address}{self.to_address}{self.amount}{self.timestamp_ns}"
+        return _digest(tx_string.encode() + _canon_bytes(self.data), self.hash_algorithm)
+    
+    @property
+    def timestamp(self) -> str:
+        """Время создания в ISO-формате"""
+        return iso_from_ns(self.timestamp_ns)
+    
+    @property
+    def tx_hash_hex(self) -> str:
+        """Хеш транзакции в hex для отображения и сериализации"""
+        return self.tx_hash.hex()
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            "from": self.from_address,
-            "to": self.to_address,
-            "amount": self.amount,
-            "timestamp": self.timestamp,
-            "data": self.data,
-            "hash": self.tx_hash
-        }
+        # Транзакция не меняется после создания — словарь строим один раз,
+        # а наружу отдаем копию, чтобы изменения вызывающего не попали в кеш
+        if self._dict_cache is None:
+            self._dict_cache = {
+                "from": self.from_address,
+                "to": self.to_address,
+                "amount": self.amount,
+                "timestamp": self.timestamp,
+                "data": self.data,
+                "hash": self.tx_hash_hex
+            }
+        return dict(self._dict_cache)
+
+class TransactionBatch:
+    """
+    Транзакции блока в колоночном виде (Struct-of-Arrays) — основное
+    хранилище транзакций в блоке. Адреса — индексы в таблице адресов,
+    суммы и время — типизированные массивы, хеши — один непрерывный
+    буфер по 32 байта; объекты Transaction собираются по запросу
+    """
+    
+    # Вид суммы: float и int, точно представимые в double, лежат в колонке
+    # amount, остальные (большие int, Decimal и т.п.) — как есть в _exact_amounts
+    _FLOAT, _INT, _OBJECT = 0, 1, 2
+    _MAX_EXACT_INT = 2 ** 53
+    
+    def __init__(self, hash_algorithm: str = DEFAULT_HASH_ALGORITHM):
+        self.hash_algorithm = hash_algorithm
+        self.addresses: List[str] = []
+        self._address_index: Dict[str, int] = {}
+        self.from_idx = array("I")
+        self.to_idx = array("I")
+        self.amount = array("d")
+        self.amount_kind = bytearray()
+        self._exact_amounts: Dict[int, Any] = {}
+        self.timestamp_ns = array("q")
+        self.tx_hashes = bytearray()
+        # data у большинства транзакций пустая — храним только непустые
+        self._data: Dict[int, Dict] = {}
+    
+    def __len__(self) -> int:
+        return len(self.amount)
+    
+    def __getitem__(self, position: int) -> Transaction:
+        """Собирает объект Transaction из колонок"""
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("transaction index out of range")
+        return Transaction._restore(
+            self.addresses[self.from_idx[position]], self.addresses[self.to_idx[position]],
+            self._amount_at(position), self._data.get(position, {}), self.timestamp_ns[position],
+            self.hash_algorithm, bytes(self.tx_hashes[position * 32:(position + 1) * 32])
+        )
+    
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+    
+    def _intern(self, address: str) -> int:
+        """Возвращает номер адреса в таблице, добавляя новый при необходимости"""
+        index = self._address_index.get(address)
+        if index is None:
+            index = len(self.addresses)
+            self._address_index[address] = index
+            self.addresses.append(address)
+        return index
+    
+    def _amount_at(self, position: int) -> Any:
+        """Сумма транзакции в исходном типе"""
+        kind = self.amount_kind[position]
+        if kind == self._FLOAT:
+            return self.amount[position]
+        if kind == self._INT:
+            return int(self.amount[position])
+        return self._exact_amounts[position]
+    
+    def append(self, transaction: Transaction):
+        """Дописывает транзакцию в колонки"""
+        position = len(self)
+        amount = transaction.amount
+        if type(amount) is float:
+            self.amount.append(amount)
+            self.amount_kind.append(self._FLOAT)
+        elif type(amount) is int and -self._MAX_EXACT_INT <= amount <= self._MAX_EXACT_INT:
+            self.amount.append(amount)
+            self.amount_kind.append(self._INT)
+        else:
+            self.amount.append(0.0)
+            self.amount_kind.append(self._OBJECT)
+            self._exact_amounts[position] = amount
+        
+        self.from_idx.append(self._intern(transaction.from_address))
+        self.to_idx.append(self._intern(transaction.to_address))
+        self.timestamp_ns.append(transaction.timestamp_ns)
+        self.tx_hashes += transaction.tx_hash
+        if transaction.data:
+            self._data[position] = transaction.data
+    
+    def amounts(self) -> List[Any]:
+        """Суммы всех транзакций в исходных типах"""
+        result = self.amount.tolist()
+        if self._INT in self.amount_kind:
+            for position, kind in enumerate(self.amount_kind):
+                if kind == self._INT:
+                    result[position] = int(result[position])
+        for position, amount in self._exact_amounts.items():
+            result[position] = amount
+        return result
+    
+    def leaf_hashes(self) -> List[bytes]:
+        """Хеши транзакций как листья дерева Меркла"""
+        view = memoryview(self.tx_hashes)
+        return [view[i:i + 32].tobytes() for i in range(0, len(view), 32)]
+    
+    def balance_deltas(self) -> Dict[str, float]:
+        """Изменение баланса каждого адреса: по проходу на колонку адресов"""
+        amounts = self.amounts()
+        deltas = [0] * len(self.addresses)
+        for index, amount in zip(self.from_idx, amounts):
+            deltas[index] -= amount
+        for index, amount in zip(self.to_idx, amounts):
+            deltas[index] += amount
+        return dict(zip(self.addresses, deltas))
 
 class Block:
     """Блок в астрономическом блокчейне"""
     
-    def __init__(self, index: int, transactions: List[Transaction], previous_hash: str, astronomical_data: Dict[str, Any]):
+    __slots__ = (
+        "index", "timestamp_ns", "batch", "previous_hash", "astronomical_data",
+        "astronomical_hash", "hash_algorithm", "_merkle", "merkle_root", "nonce", "hash", "_sealed"
+    )
+    
+    def __init__(self, index: int, transactions: List[Transaction], previous_hash: str, astronomical_data: Dict[str, Any],
+                 timestamp_ns: Optional[int] = None, hash_algorithm: str = DEFAULT_HASH_ALGORITHM):
         self.index = index
-        self.timestamp = datetime.utcnow().isoformat()
-        self.transactions = transactions
+        self.timestamp_ns = timestamp_ns if timestamp_ns is not None else time.time_ns()
         self.previous_hash = previous_hash
         self.astronomical_data = astronomical_data
         self.astronomical_hash = astronomical_data.get("astronomical_hash", "")
-        self.merkle_root = self.calculate_merkle_root()
+        self.hash_algorithm = hash_algorithm
+        # Транзакции хранятся только в колонках; список объектов не держим
+        self.batch = TransactionBatch(hash_algorithm)
+        self._merkle = MerkleAccumulator(hash_algorithm)
+        for transaction in transactions:
+            self.batch.append(transaction)
+            self._merkle.add(transaction.tx_hash)
+        self.merkle_root = self._merkle.root().hex()
         self.nonce = 0
         self.hash = self.calculate_hash()
+        self._sealed = False
+    
+    @property
+    def timestamp(self) -> str:
+        """Время создания в ISO-формате"""
+        return iso_from_ns(self.timestamp_ns)
+    
+    @property
+    def transactions(self) -> List[Transaction]:
+        """Транзакции блока, собранные из колонок"""
+        return list(self.batch)
+    
+    def seal(self):
+        """Запрещает изменять блок — вызывается при добавлении в цепочку"""
+        self._sealed = True
+    
+    def add_transaction(self, transaction: Transaction):
+        """Добавляет транзакцию в еще не добавленный в цепочку блок, обновляя Merkle root за O(log N)"""
+        if self._sealed:
+            raise ValueError(f"Block {self.index} is already in the chain and cannot be modified")
+        self.batch.append(transaction)
+        self._merkle.add(transaction.tx_hash)
+        self.merkle_root = self._merkle.root().hex()
+        self.hash = self.calculate_hash()
     
     def calculate_merkle_root(self) -> str:
-        """Вычисляет Merkle root для транзакций"""
-        if not self.transactions:
-            return hashlib.sha256("".encode()).hexdigest()
+        """Вычисляет Merkle root для транзакций заново, по всему дереву"""
+        if not len(self.batch):
+            return _digest(b"", self.hash_algorithm).hex()
         
-        tx_hashes = [tx.tx_hash for tx in self.transactions]
+        # Хеши транзакций лежат в одном буфере сырыми 32 байтами:
+        # пара узлов — ровно 64 байта без hex-кодирования на каждом уровне
+        tx_hashes = self.batch.leaf_hashes()
         
         while len(tx_hashes) > 1:
             if len(tx_hashes) % 2 == 1:
                 tx_hashes.append(tx_hashes[-1])  # Дублируем последний хеш
             
-            new_hashes = []
-            for i in range(0, len(tx_hashes), 2):
-                combined = tx_hashes[i] + tx_hashes[i + 1]
-                new_hashes.append(hashlib.sha256(combined.encode()).hexdigest())
-            
-            tx_hashes = new_hashes
+            tx_hashes = _hash_level(tx_hashes, self.hash_algorithm)
         
-        return tx_hashes[0]
+        return tx_hashes[0].hex()
     
     def calculate_hash(self) -> str:
         """Вычисляет хеш блока"""
-        block_string = f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.astronomical_hash}{self.nonce}"
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        block_string = f"{self.index}{self.timestamp_ns}{self.previous_hash}{self.merkle_root}{self.astronomical_hash}{self.nonce}"
+        return _digest(block_string.encode(), self.hash_algorithm).hex()
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -86,18 +381,67 @@ class Block:
 class AstroBlockchain:
     """Астрономический блокчейн"""
     
-    def __init__(self):
+    def __init__(self, storage_path: Optional[str] = None, hash_algorithm: Optional[str] = None):
         self.chain: List[Block] = []
         self.pending_transactions: List[Transaction] = []
-        self.create_genesis_block()
+        # Цепочка только дополняется, поэтому балансы ведем инкрементально,
+        # а проверенные блоки повторно не валидируем
+        self._balances: Dict[str, float] = defaultdict(int)
+        self._validated_up_to = 0
+        # Необязательное хранилище на диске: блоки дописываются в файл
+        # и восстанавливаются из него при следующем запуске
+        self.store = BlockStore(storage_path) if storage_path else None
+        if self.store is not None and len(self.store) > 0:
+            # Хеш-функция сохраненной цепочки записана в генезис-блоке
+            _, _, stored_data = self.store.read_block(0)
+            stored_algorithm = stored_data.get("hash_algorithm", DEFAULT_HASH_ALGORITHM)
+            if hash_algorithm is not None and hash_algorithm != stored_algorithm:
+                raise ValueError(f"{self.store.path} uses {stored_algorithm}, not {hash_algorithm}")
+            self.hash_algorithm = stored_algorithm
+        else:
+            self.hash_algorithm = hash_algorithm or DEFAULT_HASH_ALGORITHM
+        check_hash_algorithm(self.hash_algorithm)
+        
+        if self.store is not None and len(self.store) > 0:
+            self._load_from_store()
+        else:
+            self.create_genesis_block()
+    
+    def _load_from_store(self):
+        """Восстанавливает цепочку и балансы из хранилища"""
+        for position in range(len(self.store)):
+            header, tx_records, astronomical_data = self.store.read_block(position)
+            index, timestamp_ns, previous_hash, merkle_root, _, block_hash, nonce = header
+            
+            transactions = [
+                Transaction(from_address, to_address, amount, data, timestamp_ns=tx_timestamp_ns,
+                            hash_algorithm=self.hash_algorithm)
+                for from_address, to_address, amount, data, tx_timestamp_ns in tx_records
+            ]
+            # Генезис-блок всегда ссылается на "0"
+            block = Block(index, transactions, previous_hash if index else "0", astronomical_data,
+                          timestamp_ns=timestamp_ns, hash_algorithm=self.hash_algorithm)
+            block.nonce = nonce
+            block.hash = block.calculate_hash()
+            
+            if block.merkle_root != merkle_root or block.hash != block_hash:
+                raise ValueError(f"Block {index} in {self.store.path} does not match its stored hash")
+            
+            block.seal()
+            self.chain.append(block)
+            self._apply_balances(block)
     
     def create_genesis_block(self):
         """Создает генезис блок"""
         genesis_astronomical_data = {
             "type": "genesis",
+            "hash_algorithm": self.hash_algorithm,
             "astronomical_hash": "0000000000000000000000000000000000000000000000000000000000000000"
         }
-        genesis_block = Block(0, [], "0", genesis_astronomical_data)
+        genesis_block = Block(0, [], "0", genesis_astronomical_data, hash_algorithm=self.hash_algorithm)
+        if self.store is not None:
+            self.store.append(genesis_block)
+        genesis_block.seal()
         self.chain.append(genesis_block)
     
     def get_latest_block(self) -> Block:
@@ -106,6 +450,13 @@ class AstroBlockchain:
     
     def add_transaction(self, transaction: Transaction):
         """Добавляет транзакцию в пул ожидания"""
+        if transaction.hash_algorithm != self.hash_algorithm:
+            raise ValueError(f"Transaction is hashed with {transaction.hash_algorithm}, "
+                             f"but the chain uses {self.hash_algorithm}")
+        # Транзакция, которую нельзя сохранить, не должна попасть в пул:
+        # иначе на ней будет падать каждый следующий create_block
+        if self.store is not None:
+            self.store.check_transaction(transaction)
         self.pending_transactions.append(transaction)
     
     def create_block(self, astronomical_data: Dict[str, Any]) -> Block:
@@ -115,19 +466,32 @@ class AstroBlockchain:
         
         # Берем транзакции из пула
         transactions = self.pending_transactions.copy()
-        self.pending_transactions = []  # Очищаем пул
         
         # Создаем блок
-        new_block = Block(index, transactions, previous_hash, astronomical_data)
+        new_block = Block(index, transactions, previous_hash, astronomical_data, hash_algorithm=self.hash_algorithm)
+        
+        # Сначала сохраняем на диск: если запись не удалась, цепочка,
+        # балансы и пул в памяти остаются прежними
+        if self.store is not None:
+            self.store.append(new_block)
         
         # Добавляем в цепочку
+        self.pending_transactions = []  # Очищаем пул
+        new_block.seal()
         self.chain.append(new_block)
+        self._apply_balances(new_block)
         
         return new_block
     
+    def _apply_balances(self, block: Block):
+        """Учитывает транзакции нового блока в балансах"""
+        for address, delta in block.batch.balance_deltas().items():
+            self._balances[address] += delta
+    
     def is_chain_valid(self) -> bool:
         """Проверяет валидность всей цепочки"""
-        for i in range(1, len(self.chain)):
+        # Блоки до отметки _validated_up_to уже проверены
+        for i in range(max(1, self._validated_up_to + 1), len(self.chain)):
             current_block = self.chain[i]
             previous_block = self.chain[i - 1]
             
@@ -139,20 +503,17 @@ class AstroBlockchain:
             if current_block.previous_hash != previous_block.hash:
                 return False
         
+        self._validated_up_to = len(self.chain) - 1
         return True
     
     def get_balance(self, address: str) -> float:
-        """Вычисляет баланс адреса"""
-        balance = 0
-        
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.from_address == address:
-                    balance -= transaction.amount
-                if transaction.to_address == address:
-                    balance += transaction.amount
-        
-        return balance
+        """Возвращает баланс адреса"""
+        return self._balances.get(address, 0)
+    
+    def close(self):
+        """Закрывает хранилище на диске, если оно используется"""
+        if self.store is not None:
+            self.store.close()
     
     def get_chain_info(self) -> Dict[str, Any]:
         """Возвращает информацию о блокчейне"""
@@ -189,7 +550,10 @@ if __name__ == "__main__":
     new_block = blockchain.create_block(test_astronomical_data)
     
     print("=== BLOCKCHAIN INFO ===")
-    print(json.dumps(blockchain.get_chain_info(), indent=2))
+    if orjson:
+        print(orjson.dumps(blockchain.get_chain_info(), option=orjson.OPT_INDENT_2).decode())
+    else:
+        print(json.dumps(blockchain.get_chain_info(), indent=2))
     
     print(f"\n=== BALANCES ===")
     print(f"Alice: {blockchain.get_balance('alice')}")
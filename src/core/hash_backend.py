@@ -0,0 +1,167 @@
+import hashlib
+import os
+import platform
+import struct
+import subprocess
+import sys
+from typing import Dict, Any, List, Optional, Set
+
+class PurePythonSHA256:
+    """
+    Эталонная реализация SHA-256 на чистом Python с интерфейсом hashlib
+    (update/copy/digest/hexdigest). Медленная — нужна для A/B-проверки
+    """
+    
+    _K = (
+        0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+        0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+        0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+        0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+        0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+        0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+        0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+        0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+    )
+    _H0 = (0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19)
+    
+    def __init__(self, data: bytes = b""):
+        self._state = list(self._H0)
+        self._buffer = b""
+        self._length = 0
+        self.update(data)
+    
+    @staticmethod
+    def _rotr(x: int, n: int) -> int:
+        return ((x >> n) | (x << (32 - n))) & 0xFFFFFFFF
+    
+    def _compress(self, block: bytes):
+        rotr = self._rotr
+        w = list(struct.unpack(">16I", block))
+        for i in range(16, 64):
+            s0 = rotr(w[i - 15], 7) ^ rotr(w[i - 15], 18) ^ (w[i - 15] >> 3)
+            s1 = rotr(w[i - 2], 17) ^ rotr(w[i - 2], 19) ^ (w[i - 2] >> 10)
+            w.append((w[i - 16] + s0 + w[i - 7] + s1) & 0xFFFFFFFF)
+        
+        a, b, c, d, e, f, g, h = self._state
+        for i in range(64):
+            t1 = (h + (rotr(e, 6) ^ rotr(e, 11) ^ rotr(e, 25)) + ((e & f) ^ (~e & g)) + self._K[i] + w[i]) & 0xFFFFFFFF
+            t2 = ((rotr(a, 2) ^ rotr(a, 13) ^ rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))) & 0xFFFFFFFF
+            h, g, f, e, d, c, b, a = g, f, e, (d + t1) & 0xFFFFFFFF, c, b, a, (t1 + t2) & 0xFFFFFFFF
+        
+        self._state = [(x + y) & 0xFFFFFFFF for x, y in zip(self._state, (a, b, c, d, e, f, g, h))]
+    
+    def update(self, data: bytes):
+        data = bytes(data)
+        self._length += len(data)
+        self._buffer += data
+        while len(self._buffer) >= 64:
+            self._compress(self._buffer[:64])
+            self._buffer = self._buffer[64:]
+    
+    def copy(self) -> "PurePythonSHA256":
+        clone = PurePythonSHA256()
+        clone._state = list(self._state)
+        clone._buffer = self._buffer
+        clone._length = self._length
+        return clone
+    
+    def digest(self) -> bytes:
+        final = self.copy()
+        padding = b"\x80" + b"\x00" * ((55 - self._length) % 64)
+        final.update(padding + struct.pack(">Q", self._length * 8))
+        return struct.pack(">8I", *final._state)
+    
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+# Реализации SHA-256, между которыми можно переключаться:
+# "openssl" — hashlib, который сам выбирает SHA-NI/AVX2/SSE4.1/ARMv8 SHA2
+# внутри OpenSSL; "pure_python" — эталон для сверки результатов
+BACKENDS = {
+    "openssl": hashlib.sha256,
+    "pure_python": PurePythonSHA256,
+}
+
+def detect_cpu_features() -> Set[str]:
+    """Определяет аппаратные расширения, ускоряющие SHA-256"""
+    flags: Set[str] = set()
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/cpuinfo") as cpuinfo:
+                for line in cpuinfo:
+                    key, _, value = line.partition(":")
+                    if key.strip() in ("flags", "Features"):
+                        flags.update(value.lower().split())
+                        break
+        elif sys.platform == "darwin":
+            result = subprocess.run(
+                ["sysctl", "-n", "machdep.cpu.features", "machdep.cpu.leaf7_features"],
+                capture_output=True, text=True, timeout=5
+            )
+            flags.update(result.stdout.lower().split())
+    except (OSError, subprocess.SubprocessError):
+        pass
+    
+    features = set()
+    if "sha_ni" in flags or "sha" in flags:
+        features.add("sha_ni")
+    if "avx2" in flags:
+        features.add("avx2")
+    if "sse4_1" in flags or "sse4.1" in flags:
+        features.add("sse4_1")
+    # ARMv8: sha2 в /proc/cpuinfo, на Apple Silicon расширение есть всегда
+    if "sha2" in flags or (sys.platform == "darwin" and platform.machine() == "arm64"):
+        features.add("neon_sha2")
+    return features
+
+# Определяется при первом запросе информации: выбор реализации от нее
+# не зависит, а на macOS определение запускает sysctl
+_cpu_features: Optional[Set[str]] = None
+
+def _accelerated_path(features: Set[str]) -> str:
+    """Самый быстрый путь SHA-256, доступный OpenSSL на этом процессоре"""
+    for name in ("sha_ni", "neon_sha2", "avx2", "sse4_1"):
+        if name in features:
+            return name
+    return "generic"
+
+_backend_name = os.environ.get("ASTROCHAIN_HASH_BACKEND", "openssl")
+if _backend_name not in BACKENDS:
+    _backend_name = "openssl"
+_new = BACKENDS[_backend_name]
+
+def set_backend(name: str):
+    """Переключает реализацию SHA-256 (например, для A/B-сравнения)"""
+    global _backend_name, _new
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown hash backend: {name}")
+    _backend_name = name
+    _new = BACKENDS[name]
+
+def get_backend() -> str:
+    """Возвращает имя выбранной реализации"""
+    return _backend_name
+
+def available_backends() -> List[str]:
+    """Возвращает имена доступных реализаций"""
+    return list(BACKENDS)
+
+def get_backend_info() -> Dict[str, Any]:
+    """Возвращает информацию о выбранной реализации и возможностях процессора"""
+    global _cpu_features
+    if _cpu_features is None:
+        _cpu_features = detect_cpu_features()
+    return {
+        "backend": _backend_name,
+        "cpu_features": sorted(_cpu_features),
+        "accelerated_path": _accelerated_path(_cpu_features) if _backend_name == "openssl" else "none",
+        "machine": platform.machine()
+    }
+
+def new(data: bytes = b""):
+    """Создает объект SHA-256 (update/copy/digest) выбранной реализации"""
+    return _new(data)
+
+def sha256_single(data: bytes) -> bytes:
+    """SHA-256 одного сообщения (сырые 32 байта)"""
+    return _new(data).digest()
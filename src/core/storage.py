@@ -0,0 +1,187 @@
+import json
+import mmap
+import os
+import struct
+from typing import List, Dict, Any, Optional, Tuple
+
+# Заголовок блока фиксированной длины: index, timestamp_ns, previous_hash,
+# merkle_root, astronomical_hash, hash, nonce и длина тела
+_BLOCK_HEADER = struct.Struct("<IQ32s32s32s32sQI")
+# Заголовок транзакции: timestamp_ns, тип суммы (i/f), сумма,
+# длины from/to/data
+_TX_HEADER = struct.Struct("<Qc8sHHI")
+_LENGTH = struct.Struct("<I")
+_INT_AMOUNT = struct.Struct("<q")
+_FLOAT_AMOUNT = struct.Struct("<d")
+
+def _pack_hash(value: str) -> bytes:
+    """
+    hex-хеш -> 32 байта. Короткие значения вроде "0" у генезис-блока
+    (и пустой astronomical_hash) дополняются нулями
+    """
+    try:
+        packed = bytes.fromhex(value.rjust(64, "0"))
+    except ValueError:
+        packed = b""
+    if len(packed) != 32:
+        raise ValueError(f"Cannot store hash {value!r}: expected at most 64 hex characters")
+    return packed
+
+def _encode_transaction(tx) -> Tuple[bytes, bytes, bytes, bytes, bytes]:
+    """
+    Кодирует поля транзакции: (тип суммы, сумма, from, to, data).
+    Отвергает значения, которые после чтения дали бы другой хеш
+    """
+    # Тип суммы сохраняем: от него зависит строка в хеше транзакции.
+    # Проверяем точный тип — bool, Decimal и т.п. после чтения дали бы
+    # другую строку и другой хеш
+    from_bytes = tx.from_address.encode()
+    to_bytes = tx.to_address.encode()
+    if len(from_bytes) > 0xFFFF or len(to_bytes) > 0xFFFF:
+        raise ValueError("Cannot store address longer than 65535 bytes")
+    try:
+        if type(tx.amount) is int:
+            amount_type, amount = b"i", _INT_AMOUNT.pack(tx.amount)
+        elif type(tx.amount) is float:
+            amount_type, amount = b"f", _FLOAT_AMOUNT.pack(tx.amount)
+        else:
+            raise TypeError(f"Cannot store amount of type {type(tx.amount).__name__}")
+    except struct.error:
+        raise ValueError(f"Cannot store amount {tx.amount}: out of 64-bit range")
+    data_bytes = json.dumps(tx.data, sort_keys=True).encode() if tx.data else b""
+    return amount_type, amount, from_bytes, to_bytes, data_bytes
+
+class BlockStore:
+    """
+    Append-only файл с блоками в двоичном виде. Запись — в конец файла,
+    чтение — через mmap по индексу смещений записей
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a+b")
+        self._mmap: Optional[mmap.mmap] = None
+        self.offsets: List[int] = []
+        self._scan()
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def _view(self) -> mmap.mmap:
+        """Возвращает отображение файла, перестраивая его после дозаписи"""
+        size = os.fstat(self._file.fileno()).st_size
+        if self._mmap is None or len(self._mmap) < size:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+    
+    def _scan(self):
+        """Строит индекс смещений; недописанный хвост (сбой при записи) отрезается"""
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            return
+        
+        view = self._view()
+        offset = 0
+        while offset + _BLOCK_HEADER.size <= size:
+            body_length = _BLOCK_HEADER.unpack_from(view, offset)[-1]
+            end = offset + _BLOCK_HEADER.size + body_length
+            if end > size:
+                break
+            self.offsets.append(offset)
+            offset = end
+        
+        if offset != size:
+            self._mmap.close()
+            self._mmap = None
+            self._file.truncate(offset)
+    
+    def append(self, block) -> int:
+        """Дописывает блок в конец файла и возвращает его номер в хранилище"""
+        encoded = [(tx.timestamp_ns,) + _encode_transaction(tx) for tx in block.transactions]
+        astronomical_bytes = json.dumps(block.astronomical_data, sort_keys=True).encode()
+        
+        body_length = _LENGTH.size + _LENGTH.size + len(astronomical_bytes)
+        for _, _, _, from_bytes, to_bytes, data_bytes in encoded:
+            body_length += _TX_HEADER.size + len(from_bytes) + len(to_bytes) + len(data_bytes)
+        
+        record = bytearray(_BLOCK_HEADER.size + body_length)
+        _BLOCK_HEADER.pack_into(
+            record, 0, block.index, block.timestamp_ns, _pack_hash(block.previous_hash),
+            _pack_hash(block.merkle_root), _pack_hash(block.astronomical_hash),
+            _pack_hash(block.hash), block.nonce, body_length
+        )
+        cursor = _BLOCK_HEADER.size
+        _LENGTH.pack_into(record, cursor, len(encoded))
+        cursor += _LENGTH.size
+        
+        for timestamp_ns, amount_type, amount, from_bytes, to_bytes, data_bytes in encoded:
+            _TX_HEADER.pack_into(record, cursor, timestamp_ns, amount_type, amount,
+                                 len(from_bytes), len(to_bytes), len(data_bytes))
+            cursor += _TX_HEADER.size
+            for chunk in (from_bytes, to_bytes, data_bytes):
+                record[cursor:cursor + len(chunk)] = chunk
+                cursor += len(chunk)
+        
+        _LENGTH.pack_into(record, cursor, len(astronomical_bytes))
+        cursor += _LENGTH.size
+        record[cursor:cursor + len(astronomical_bytes)] = astronomical_bytes
+        
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(record)
+        self._file.flush()
+        self.offsets.append(offset)
+        return len(self.offsets) - 1
+    
+    def check_transaction(self, tx):
+        """Проверяет, что транзакцию можно сохранить и восстановить без потерь"""
+        _encode_transaction(tx)
+    
+    def read_header(self, position: int) -> Tuple:
+        """
+        Читает заголовок блока: (index, timestamp_ns, previous_hash,
+        merkle_root, astronomical_hash, hash, nonce) — хеши в hex
+        """
+        fields = _BLOCK_HEADER.unpack_from(self._view(), self.offsets[position])
+        index, timestamp_ns, previous_hash, merkle_root, astronomical_hash, block_hash, nonce, _ = fields
+        return (index, timestamp_ns, previous_hash.hex(), merkle_root.hex(),
+                astronomical_hash.hex(), block_hash.hex(), nonce)
+    
+    def read_block(self, position: int) -> Tuple[Tuple, List[Tuple], Dict[str, Any]]:
+        """
+        Читает блок целиком: заголовок, транзакции в виде
+        (from, to, amount, data, timestamp_ns) и астрономические данные
+        """
+        view = self._view()
+        header = self.read_header(position)
+        cursor = self.offsets[position] + _BLOCK_HEADER.size
+        (tx_count,) = _LENGTH.unpack_from(view, cursor)
+        cursor += _LENGTH.size
+        
+        transactions = []
+        for _ in range(tx_count):
+            timestamp_ns, amount_type, amount, from_length, to_length, data_length = \
+                _TX_HEADER.unpack_from(view, cursor)
+            cursor += _TX_HEADER.size
+            amount_format = _INT_AMOUNT if amount_type == b"i" else _FLOAT_AMOUNT
+            from_address = view[cursor:cursor + from_length].decode()
+            cursor += from_length
+            to_address = view[cursor:cursor + to_length].decode()
+            cursor += to_length
+            data = json.loads(view[cursor:cursor + data_length]) if data_length else {}
+            cursor += data_length
+            transactions.append((from_address, to_address, amount_format.unpack(amount)[0], data, timestamp_ns))
+        
+        (astronomical_length,) = _LENGTH.unpack_from(view, cursor)
+        cursor += _LENGTH.size
+        astronomical_data = json.loads(view[cursor:cursor + astronomical_length])
+        return header, transactions, astronomical_data
+    
+    def close(self):
+        """Закрывает отображение и файл"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
@@ -0,0 +1,6 @@
+from datetime import datetime
+
+def iso_from_ns(timestamp_ns: int) -> str:
+    """Переводит время в наносекундах (UTC) в ISO-строку"""
+    seconds, nanoseconds = divmod(timestamp_ns, 1_000_000_000)
+    return datetime.utcfromtimestamp(seconds).replace(microsecond=nanoseconds // 1000).isoformat()
@@ -3,9 +3,9 @@ import json
 from datetime import datetime
 
 # Импортируем наши модули
-exec(open('src/astronomical/data_fetcher.py').read())
-exec(open('src/core/blockchain.py').read())
-exec(open('src/consensus/proof_of_astronomy.py').read())
+from astronomical.data_fetcher import AstronomicalDataFetcher
+from core.blockchain import AstroBlockchain, Transaction, Block
+from consensus.proof_of_astronomy import ProofOfAstronomy
 
 class АстроЧейнДемо:
     """